@@ -1,13 +1,19 @@
 # daemon/codechat/dep_graph.py
+import functools
+import hashlib
 import pathlib
+import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 import networkx as nx
 import structlog
 
-from tree_sitter import Parser, Language, Query
+from tree_sitter import Parser, Language, Query, Tree
 from tree_sitter_language_pack import get_language  # type: ignore[import-not-found]
 from typing import cast, Any
 
-from typing import Callable, Dict, Set, Optional
+from typing import Callable, Deque, Dict, FrozenSet, Iterator, Set, Optional, Tuple
 
 logger = structlog.get_logger(__name__)
 
@@ -45,6 +51,11 @@ QueryConfig = Dict[str, Query]
 ExtractorConfig = Dict[str, Callable[[str], str]]
 SuffixToLangMap = Dict[str, str]
 
+# How many files build() reads ahead of the file it is currently parsing
+READ_AHEAD_FILES = 64
+# How many recently parsed files keep their syntax tree so the next edit can be re-parsed incrementally
+INCREMENTAL_TREE_CACHE_SIZE = 32
+
 LANGUAGES: LangConfig = {}
 QUERIES: QueryConfig = {}
 EXTRACTORS: ExtractorConfig = {}
@@ -155,15 +166,8 @@ def _initialize_language_configs():
             lang_obj = get_language(cast(Any, lang_name))
             LANGUAGES[lang_name] = lang_obj
             
-            # The Query constructor issue - try both patterns
-            try:
-                # Try language.query(string) first (most likely correct)
-                query_obj = lang_obj.query(config["query_str"])
-            except AttributeError:
-                # Fallback to Query(language, string) if lang_obj doesn't have query method
-                query_obj = Query(lang_obj, config["query_str"])
-            
-            QUERIES[lang_name] = query_obj
+            # Compiled once here and reused by every parse; Language.query() is deprecated upstream
+            QUERIES[lang_name] = Query(lang_obj, config["query_str"])
             EXTRACTORS[lang_name] = config["extractor"]
             for suffix in config["suffixes"]:
                 SUFFIX_TO_LANG[suffix] = lang_name
@@ -175,20 +179,109 @@ def _initialize_language_configs():
 
 _initialize_language_configs()
 
+@functools.lru_cache(maxsize=64)
+def _lang_for_suffix(suffix: str) -> Optional[str]:
+    """Map a raw ``Path.suffix`` to a loaded language name, or None if unsupported."""
+    # The tables above are fixed after import, so the lower()/membership work is done once per suffix
+    lang_name = SUFFIX_TO_LANG.get(suffix.lower())
+    return lang_name if lang_name in LANGUAGES else None
+
+# Parsers are reused across parses and DepGraph instances, one per language per thread,
+# since a Parser must not be shared between threads
+_thread_parsers = threading.local()
+
+def _get_parser(lang_name: str) -> Parser:
+    """Return the calling thread's parser for ``lang_name``, creating it on first use."""
+    parsers: Optional[Dict[str, Parser]] = getattr(_thread_parsers, "parsers", None)
+    if parsers is None:
+        parsers = _thread_parsers.parsers = {}
+    parser = parsers.get(lang_name)
+    if parser is None:
+        parser = parsers[lang_name] = Parser(LANGUAGES[lang_name])
+    return parser
+
+def _common_prefix_len(a: bytes, b: bytes) -> int:
+    """Length of the longest common prefix of ``a`` and ``b``."""
+    # Binary search over slice equality keeps the byte comparisons in C
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_suffix_len(a: bytes, b: bytes, limit: int) -> int:
+    """Length of the longest common suffix of ``a`` and ``b``, capped at ``limit``."""
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _point_at(source: bytes, offset: int) -> Tuple[int, int]:
+    """Tree-sitter (row, byte column) of ``offset`` in ``source``."""
+    return source.count(b"\n", 0, offset), offset - (source.rfind(b"\n", 0, offset) + 1)
+
+def _apply_edit(tree: Tree, old: bytes, new: bytes) -> None:
+    """Describe the change from ``old`` to ``new`` to ``tree`` as a single replaced span."""
+    start = _common_prefix_len(old, new)
+    suffix = _common_suffix_len(old, new, min(len(old), len(new)) - start)
+    old_end, new_end = len(old) - suffix, len(new) - suffix
+    tree.edit(
+        start_byte=start,
+        old_end_byte=old_end,
+        new_end_byte=new_end,
+        start_point=_point_at(old, start),
+        old_end_point=_point_at(old, old_end),
+        new_end_point=_point_at(new, new_end),
+    )
+
 class DepGraph:
     """Builds a directed graph of local file dependencies where edges represent import relationships."""
     def __init__(self, project_root: Optional[pathlib.Path] = None):
         self.graph: nx.DiGraph = nx.DiGraph()
-        self.parser = Parser()
         self.project_root = project_root
+        self._configured_project_root = project_root  # build() may infer project_root; reset() restores this
         self.file_map: Dict[str, pathlib.Path] = {}  # Maps project-relative paths to full paths
         self.import_cache: Dict[str, Set[pathlib.Path]] = {}  # Cache for import resolution
-
-    def build(self, files: list[pathlib.Path]) -> None:
-        """Build a dependency graph of local file relationships."""
+        # Memoized _get_file_id results for files in file_map, valid for _file_ids_root; emptied when
+        # project_root changes or the file set is rebuilt, so it never outgrows the project
+        self._file_ids: Dict[pathlib.Path, str] = {}
+        self._file_ids_root: Optional[pathlib.Path] = project_root
+        # Raw imports keyed by (language, content hash), so unchanged or duplicated content skips tree-sitter;
+        # _parse_cache records each file's current key and bounds which entries are kept
+        self._imports_by_content: Dict[Tuple[str, bytes], FrozenSet[str]] = {}
+        self._parse_cache: Dict[pathlib.Path, Tuple[str, bytes]] = {}
+        # (language, source, tree) of recently parsed files, least recently parsed first, so edits re-parse incrementally
+        self._trees: "OrderedDict[pathlib.Path, Tuple[str, bytes, Tree]]" = OrderedDict()
+        # Memoized transitive queries, tagged with the graph generation they were computed under.
+        # The generation is bumped after every mutation made through DepGraph, so a result computed
+        # by a query that overlapped a watcher update is never served afterwards.
+        self._graph_generation = 0
+        self._descendants_cache: Dict[str, Tuple[int, FrozenSet[str]]] = {}
+        self._ancestors_cache: Dict[str, Tuple[int, FrozenSet[str]]] = {}
+
+    def build(self, files: list[pathlib.Path], sources: Optional[Dict[pathlib.Path, bytes]] = None,
+              force: bool = False) -> None:
+        """Build a dependency graph of local file relationships.
+
+        ``sources`` optionally maps paths to in-memory content; those files are not read from disk.
+        Files whose content is unchanged since an earlier build reuse their parsed imports unless
+        ``force`` is set.
+        """
         self.graph.clear()
         self.file_map.clear()
+        self._file_ids.clear()
         self.import_cache.clear()
+        if force:
+            self._parse_cache.clear()
+            self._imports_by_content.clear()
+            self._trees.clear()
         
         # Infer project root if not provided
         if self.project_root is None and files:
@@ -206,38 +299,20 @@ class DepGraph:
         
         # Build file mapping: project-relative path -> full path
         for path in files:
-            try:
-                if self.project_root is not None:
-                    rel_path = path.relative_to(self.project_root)
-                    file_id = str(rel_path)
-                else:
-                    file_id = str(path)
-                self.file_map[file_id] = path
-                self.graph.add_node(file_id)
-            except ValueError:
-                # File is outside project root, use absolute path as fallback
-                file_id = str(path)
-                self.file_map[file_id] = path
-                self.graph.add_node(file_id)
+            file_id = self._get_file_id(path)
+            self.file_map[file_id] = path
+            self.graph.add_node(file_id)
         
         logger.debug("File map built", 
                     total_files=len(self.file_map),
                     sample_paths=list(self.file_map.keys())[:5])
         
-        # Build file-to-file dependencies
-        for path in files:
-            try:
-                if self.project_root is not None:
-                    rel_path = path.relative_to(self.project_root)
-                    file_id = str(rel_path)
-                else:
-                    file_id = str(path)
-            except ValueError:
-                file_id = str(path)
-                
+        # Build file-to-file dependencies; reads run ahead on a thread pool, caller-supplied sources take precedence
+        for path, source in self._iter_sources(files, sources):
+            file_id = self._get_file_id(path)
             logger.debug("Processing file for dependencies", file=str(path), file_id=file_id)
             
-            local_dependencies = self._resolve_local_imports(path)
+            local_dependencies = self._resolve_local_imports(path, source)
             logger.debug("Found local dependencies", file_id=file_id, dependencies=[self._get_file_id(d) for d in local_dependencies])
             
             for dep_path in local_dependencies:
@@ -248,23 +323,105 @@ class DepGraph:
                 else:
                     logger.debug("Skipped dependency (not in file_map)", dep=dep_id)
                     
+        self._invalidate_query_caches()
         logger.info("Local dependency graph built.", 
                    nodes=self.graph.number_of_nodes(), 
                    edges=self.graph.number_of_edges(),
                    project_root=str(self.project_root))
 
+    def reset(self) -> None:
+        """Forget all files and edges, returning to the state right after construction.
+
+        Parsed-import caches are kept, since they are keyed by content and stay valid.
+        """
+        self.graph.clear()
+        self.file_map.clear()
+        self._file_ids.clear()
+        self.import_cache.clear()
+        self._invalidate_query_caches()
+        self.project_root = self._configured_project_root
+
     # ---------- helpers -------------------------------------------------
+    def _invalidate_query_caches(self) -> None:
+        """Drop memoized transitive queries; call only after the graph structure has changed."""
+        self._graph_generation += 1
+        self._descendants_cache.clear()
+        self._ancestors_cache.clear()
+
+    def _iter_sources(self, paths: list[pathlib.Path],
+                      sources: Optional[Dict[pathlib.Path, bytes]] = None) -> Iterator[Tuple[pathlib.Path, Optional[bytes]]]:
+        """Yield ``(path, content)`` for each path in order, reading ahead on a thread pool.
+
+        Tree-sitter parsing holds the GIL, so only the reads are worth overlapping. At most
+        READ_AHEAD_FILES reads are in flight or waiting to be consumed, which bounds memory on
+        large projects. Content is None for unsupported or unreadable files, which the regular
+        per-file read then reports.
+        """
+        def read(path: pathlib.Path) -> Optional[bytes]:
+            try:
+                return path.read_bytes()
+            except (OSError, ValueError):
+                return None
+
+        def known(path: pathlib.Path) -> bool:
+            """Whether the content is settled without touching the disk."""
+            return (sources is not None and path in sources) or _lang_for_suffix(path.suffix) is None
+
+        def settled(path: pathlib.Path) -> Optional[bytes]:
+            return sources.get(path) if sources else None
+
+        if all(known(path) for path in paths):
+            for path in paths:
+                yield path, settled(path)
+            return
+
+        pool = ThreadPoolExecutor()
+        pending: Deque[Tuple[pathlib.Path, Future]] = deque()
+        try:
+            for path in paths:
+                if known(path):
+                    future: Future = Future()
+                    future.set_result(settled(path))
+                else:
+                    future = pool.submit(read, path)
+                pending.append((path, future))
+                if len(pending) >= READ_AHEAD_FILES:
+                    ready_path, ready = pending.popleft()
+                    yield ready_path, ready.result()
+            while pending:
+                ready_path, ready = pending.popleft()
+                yield ready_path, ready.result()
+        finally:
+            # If the consumer stops early, drop the queued reads rather than finishing them
+            pool.shutdown(wait=False, cancel_futures=True)
+
     def _get_file_id(self, path: pathlib.Path) -> str:
-        """Get stable file identifier - project-relative path or absolute path."""
+        """Get stable file identifier - project-relative path or absolute path.
+
+        Identifiers are interned: the same id is produced for every edge and lookup, so graph
+        and file_map hits compare by identity instead of character by character. Ids of files in
+        ``file_map`` are also memoized per path until ``project_root`` changes; query paths and
+        import candidates are not, so the memo stays bounded by the project's size.
+        """
+        if self.project_root is not self._file_ids_root:
+            self._file_ids = {}
+            self._file_ids_root = self.project_root
+        file_id = self._file_ids.get(path)
+        if file_id is not None:
+            return file_id
+
         try:
             if self.project_root is not None:
                 rel_path = path.relative_to(self.project_root)
-                return str(rel_path)
+                file_id = sys.intern(str(rel_path))
             else:
-                return str(path)
+                file_id = sys.intern(str(path))
         except (ValueError, TypeError):
             # File outside project root or no project root
-            return str(path)
+            file_id = sys.intern(str(path))
+        if file_id in self.file_map:
+            self._file_ids[path] = file_id
+        return file_id
     
     def _infer_project_root(self, files: list[pathlib.Path]) -> pathlib.Path:
         """Infer project root by finding common parent directory."""
@@ -307,12 +464,12 @@ class DepGraph:
             logger.warning("No common path parts found, falling back to filesystem root")
             return pathlib.Path("/")
 
-    def _resolve_local_imports(self, file_path: pathlib.Path) -> Set[pathlib.Path]:
+    def _resolve_local_imports(self, file_path: pathlib.Path, source: Optional[bytes] = None) -> Set[pathlib.Path]:
         """Resolve imports in a file to actual local file paths."""
         if not self.project_root:
             return set()
             
-        raw_imports = self._parse_raw_imports(file_path)
+        raw_imports = self._parse_raw_imports(file_path, source)
         local_files: Set[pathlib.Path] = set()
         
         for import_path in raw_imports:
@@ -321,42 +478,97 @@ class DepGraph:
             
         return local_files
 
-    def _parse_raw_imports(self, path: pathlib.Path) -> set[str]:
-        """Parse raw import statements without any extraction/filtering."""
-        raw_imports: Set[str] = set()
-        lang_name = SUFFIX_TO_LANG.get(path.suffix.lower())
+    def _parse_raw_imports(self, path: pathlib.Path, source: Optional[bytes] = None) -> set[str]:
+        """Parse raw import statements without any extraction/filtering.
 
-        if not lang_name or lang_name not in LANGUAGES:
-            logger.debug("No language support for file", file=str(path), suffix=path.suffix)
-            return raw_imports
-        
-        lang_obj = LANGUAGES[lang_name]
-        query_obj = QUERIES[lang_name]
+        If ``source`` is given it is used as the file content instead of reading ``path`` from disk.
+        """
+        lang_name = _lang_for_suffix(path.suffix)
 
-        self.parser.language = lang_obj
+        if lang_name is None:
+            logger.debug("No language support for file", file=str(path), suffix=path.suffix)
+            return set()
 
         try:
-            content_bytes = path.read_bytes()
-            tree = self.parser.parse(content_bytes)
-            captures_dict = query_obj.captures(tree.root_node)
-
-            # Collect raw import strings without any extraction
-            for _capture_name, captured_nodes in captures_dict.items():
-                for node in captured_nodes:
-                    if node.text:
-                        raw_text = node.text.decode("utf-8", errors="replace").strip("'\"")
-                        if raw_text:
-                            raw_imports.add(raw_text)
-                            logger.debug("Found raw import", file=str(path), import_text=raw_text)
-            
-            logger.debug("Raw imports parsed", file=str(path), count=len(raw_imports), imports=list(raw_imports))
-                            
+            content_bytes = source if source is not None else path.read_bytes()
         except FileNotFoundError:
             logger.warning("File not found during import parsing.", path=str(path), lang=lang_name)
+            return set()
         except Exception as e:
+            logger.error("Error reading file for import parsing.", path=str(path), lang=lang_name, error=str(e), exc_info=True)
+            return set()
+
+        content_key = (lang_name, hashlib.blake2b(content_bytes, digest_size=16).digest())
+        self._parse_cache[path] = content_key
+        cached = self._imports_by_content.get(content_key)
+        if cached is not None:
+            logger.debug("Raw imports served from cache", file=str(path))
+            return set(cached)
+
+        try:
+            raw_imports = self._parse_raw_imports_bytes(content_bytes, lang_name, path)
+        except Exception as e:
+            # Not cached, so the next read of this content parses it again
             logger.error("Error parsing imports.", path=str(path), lang=lang_name, error=str(e), exc_info=True)
+            return set()
+        self._imports_by_content[content_key] = frozenset(raw_imports)
+        if len(self._imports_by_content) > 2 * len(self._parse_cache):
+            self._prune_content_cache()
+        logger.debug("Raw imports parsed", file=str(path), count=len(raw_imports), imports=list(raw_imports))
+        return raw_imports
+
+    def _prune_content_cache(self) -> None:
+        """Drop cached imports for content that no tracked file has anymore."""
+        live_keys = set(self._parse_cache.values())
+        self._imports_by_content = {key: imports for key, imports in self._imports_by_content.items() if key in live_keys}
+
+    def _parse_raw_imports_bytes(self, content_bytes: bytes, lang_name: str,
+                                 path: Optional[pathlib.Path] = None) -> set[str]:
+        """Run the language's tree-sitter import query over in-memory source.
+
+        If ``path`` is given, its previous syntax tree is reused for an incremental parse when available.
+        Parse errors propagate, so callers can tell a failed parse from a file without imports.
+        """
+        raw_imports: Set[str] = set()
+        if lang_name not in LANGUAGES:
+            return raw_imports
+
+        tree = self._parse_tree(content_bytes, lang_name, path)
+        captures_dict = QUERIES[lang_name].captures(tree.root_node)
+
+        # Collect raw import strings without any extraction
+        for _capture_name, captured_nodes in captures_dict.items():
+            for node in captured_nodes:
+                if node.text:
+                    raw_text = node.text.decode("utf-8", errors="replace").strip("'\"")
+                    if raw_text:
+                        # Module names like "os" or "react" recur across files; share one copy
+                        raw_imports.add(sys.intern(raw_text))
         return raw_imports
 
+    def _parse_tree(self, content_bytes: bytes, lang_name: str, path: Optional[pathlib.Path]) -> Tree:
+        """Parse ``content_bytes``, editing and reusing ``path``'s last tree if one is kept."""
+        parser = _get_parser(lang_name)
+        if path is None:
+            return parser.parse(content_bytes)
+
+        # Popping gives this thread sole use of the old tree, which edit() mutates in place
+        previous = self._trees.pop(path, None)
+        if previous is not None and previous[0] == lang_name:
+            _, old_bytes, old_tree = previous
+            _apply_edit(old_tree, old_bytes, content_bytes)
+            tree = parser.parse(content_bytes, old_tree)
+        else:
+            tree = parser.parse(content_bytes)
+
+        self._trees[path] = (lang_name, content_bytes, tree)
+        while len(self._trees) > INCREMENTAL_TREE_CACHE_SIZE:
+            try:
+                self._trees.popitem(last=False)
+            except KeyError:  # Another thread emptied it first
+                break
+        return tree
+
     def _resolve_import_path(self, import_path: str, from_file: pathlib.Path) -> Set[pathlib.Path]:
         """Resolve an import path to actual local file paths using conservative heuristics."""
         resolved_paths: Set[pathlib.Path] = set()
@@ -372,10 +584,12 @@ class DepGraph:
         if import_path.startswith('.'):
             resolved_paths.update(self._resolve_relative_import(import_path, from_file))
         
+        # Snapshot file_map so concurrent add_or_update_file calls can't resize it mid-iteration
+        known_files = list(self.file_map.items())
+
         # Strategy 2: Direct file path match in file_map
         # Look for exact matches: "codechat/vector_db" -> "codechat/vector_db.py"
-        for file_id in self.file_map:
-            file_path = self.file_map[file_id]
+        for file_id, file_path in known_files:
             # Don't allow self-imports
             if file_path == from_file:
                 continue
@@ -387,8 +601,7 @@ class DepGraph:
         # "codechat.models" should match "models.py" if there's reasonable context
         if '.' in import_path and not import_path.startswith('.'):
             last_component = import_path.split('.')[-1]
-            for file_id in self.file_map:
-                file_path = self.file_map[file_id]
+            for file_id, file_path in known_files:
                 # Don't allow self-imports
                 if file_path == from_file:
                     continue
@@ -467,7 +680,10 @@ class DepGraph:
             ]
         
         for potential_path in potential_paths:
-            if potential_path.exists() and potential_path != from_file:
+            if potential_path == from_file:
+                continue
+            # Files already in the project map count even if they only exist in memory
+            if self._get_file_id(potential_path) in self.file_map or potential_path.exists():
                 resolved_paths.add(potential_path)
                 logger.debug("Resolved relative import", 
                            import_path=import_path,
@@ -494,37 +710,52 @@ class DepGraph:
 
         return file_identifier
 
-    def get_direct_dependencies(self, file_path: pathlib.Path) -> Set[str]:
+    def get_direct_dependencies(self, file_path: pathlib.Path) -> FrozenSet[str]:
         """Returns a set of identifiers that the given file directly depends on."""
         file_identifier = self._get_file_identifier_if_valid(file_path)
         if not file_identifier:
-            return set()
-        return set(self.graph.successors(file_identifier))
+            return frozenset()
+        return frozenset(self.graph.successors(file_identifier))
 
-    def get_direct_dependents(self, file_path: pathlib.Path) -> Set[str]:
+    def get_direct_dependents(self, file_path: pathlib.Path) -> FrozenSet[str]:
         """Returns a set of identifiers that directly depend on the given file."""
         file_identifier = self._get_file_identifier_if_valid(file_path)
         if not file_identifier:
-            return set()
-        return set(self.graph.predecessors(file_identifier))
+            return frozenset()
+        return frozenset(self.graph.predecessors(file_identifier))
 
-    def get_all_dependencies(self, file_path: pathlib.Path) -> Set[str]:
+    def get_all_dependencies(self, file_path: pathlib.Path) -> FrozenSet[str]:
         """Returns a set of all identifiers that the given file depends on (transitively)."""
         file_identifier = self._get_file_identifier_if_valid(file_path)
         if not file_identifier:
-            return set()
-        return nx.descendants(self.graph, file_identifier)
-
-    def get_all_dependents(self, file_path: pathlib.Path) -> Set[str]:
+            return frozenset()
+        generation = self._graph_generation
+        cached = self._descendants_cache.get(file_identifier)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        result = frozenset(nx.descendants(self.graph, file_identifier))
+        self._descendants_cache[file_identifier] = (generation, result)
+        return result
+
+    def get_all_dependents(self, file_path: pathlib.Path) -> FrozenSet[str]:
         """Returns a set of all identifiers that depend on the given file (transitively)."""
         file_identifier = self._get_file_identifier_if_valid(file_path)
         if not file_identifier:
-            return set()
-        return nx.ancestors(self.graph, file_identifier)
+            return frozenset()
+        generation = self._graph_generation
+        cached = self._ancestors_cache.get(file_identifier)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        result = frozenset(nx.ancestors(self.graph, file_identifier))
+        self._ancestors_cache[file_identifier] = (generation, result)
+        return result
 
     # --- Granular Update Methods ---
-    def add_or_update_file(self, path: pathlib.Path) -> None:
-        """Adds or updates a file's node and dependencies in the graph."""
+    def add_or_update_file(self, path: pathlib.Path, source: Optional[bytes] = None) -> None:
+        """Adds or updates a file's node and dependencies in the graph.
+
+        ``source`` optionally supplies the file content in memory, skipping the disk read.
+        """
         file_identifier = self._get_file_id(path)
         old_dependencies = self.get_direct_dependencies(path)  # Existing dependencies
 
@@ -537,13 +768,14 @@ class DepGraph:
         self.file_map[file_identifier] = path
 
         # Parse new dependencies and add edges to local files
-        local_files = self._resolve_local_imports(path)
+        local_files = self._resolve_local_imports(path, source)
         new_dependencies = set()
         for dep_path in local_files:
             dep_id = self._get_file_id(dep_path)
             if dep_id in self.file_map:  # Only add edges for files in our project
                 self.graph.add_edge(file_identifier, dep_id)
                 new_dependencies.add(dep_id)
+        self._invalidate_query_caches()
 
         if new_dependencies != old_dependencies:
             logger.info("Updated dependencies for file.", file=file_identifier, old=sorted(old_dependencies), new=sorted(new_dependencies))
@@ -553,9 +785,13 @@ class DepGraph:
     def remove_file(self, path: pathlib.Path) -> None:
         """Removes a file's node and its dependencies from the graph."""
         file_identifier = self._get_file_id(path)
+        self._parse_cache.pop(path, None)
+        self._trees.pop(path, None)
+        self._file_ids.pop(path, None)
         if file_identifier in self.graph:
             self.graph.remove_node(file_identifier)
             self.file_map.pop(file_identifier, None)
+            self._invalidate_query_caches()
             logger.info("Removed file from dependency graph.", file=file_identifier)
         else:
             logger.debug("File not found in dependency graph for removal.", file=file_identifier)
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List, Literal, Optional, Set
+from typing import FrozenSet, List, Literal, Optional
 from pydantic import BaseModel, Field 
 
 class ProviderType(str, Enum):
@@ -68,4 +68,4 @@ class DependencyRequest(BaseModel):
 class DependencyResponse(BaseModel):
     file_path: str = Field(..., description="The file path that was analyzed")
     dependency_type: DependencyType = Field(..., description="The type of dependency relationship queried")
-    dependencies: Set[str] = Field(..., description="Set of dependency identifiers found")
+    dependencies: FrozenSet[str] = Field(..., description="Set of dependency identifiers found")
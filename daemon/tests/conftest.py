@@ -0,0 +1,21 @@
+# daemon/tests/conftest.py
+import pytest
+
+from codechat.dep_graph import DepGraph
+
+
+@pytest.fixture(scope="session")
+def shared_dep_graph():
+    """One DepGraph for the whole session so its parse caches are reused across test modules."""
+    return DepGraph()
+
+
+@pytest.fixture
+def dep_graph(shared_dep_graph):
+    """The session's shared DepGraph, reset to an empty graph for this test."""
+    shared_dep_graph.reset()
+    return shared_dep_graph
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: heavier tests; deselect with -m 'not slow' for a quick local loop")
@@ -4,23 +4,48 @@ from google.genai import types as genai_types
 from codechat.models import ChatMessage, QueryRequest, ProviderType, Context, Snippet, SnippetType
 from codechat.prompt import PromptManager
 
+DEFAULT_SYSTEM_PROMPT = "You are CodeChat, a helpful assistant for working with code."
+CUSTOM_SYSTEM_PROMPT = "Test System Prompt"
+
+# Expected formatter output for the sample requests; plain data, so it is built once at import
+HISTORY_MESSAGES = [
+    {"role": "user", "content": "Previous question"},
+    {"role": "assistant", "content": "Previous answer"},
+]
+INSTRUCTION_MESSAGE = {"role": "user", "content": "Current question"}
+OPENAI_EXPECTED_NO_HISTORY = [
+    {"role": "developer", "content": DEFAULT_SYSTEM_PROMPT},
+    {"role": "assistant", "content": "file\nFile content 1"},
+    {"role": "assistant", "content": "method\nMethod content 2"},
+    INSTRUCTION_MESSAGE,
+]
+OPENAI_EXPECTED = OPENAI_EXPECTED_NO_HISTORY[:1] + HISTORY_MESSAGES + OPENAI_EXPECTED_NO_HISTORY[1:]
+# Anthropic format usually doesn't include the system prompt directly in messages
+ANTHROPIC_EXPECTED_NO_HISTORY = [
+    {"role": "user", "content": "file\nFile content 1"},
+    {"role": "user", "content": "method\nMethod content 2"},
+    INSTRUCTION_MESSAGE,
+]
+ANTHROPIC_EXPECTED = HISTORY_MESSAGES + ANTHROPIC_EXPECTED_NO_HISTORY
+
 # Fixtures
-@pytest.fixture
+# PromptManager and the request models are never mutated by the formatters, so one instance per module is shared
+@pytest.fixture(scope="module")
 def default_manager():
     return PromptManager()
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def custom_manager():
-    return PromptManager(system_prompt="Test System Prompt")
+    return PromptManager(system_prompt=CUSTOM_SYSTEM_PROMPT)
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_history():
     return [
         ChatMessage(role="user", content="Previous question"),
         ChatMessage(role="assistant", content="Previous answer"),
     ]
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_instruction():
     return "Current question"
 
@@ -38,61 +63,46 @@ def sample_query_request(sample_history, sample_instruction, provider=ProviderTy
         ])
     )
 
+@pytest.fixture(scope="module")
+def sample_request(sample_history, sample_instruction):
+    return sample_query_request(sample_history, sample_instruction)
+
+@pytest.fixture(scope="module")
+def sample_request_no_history(sample_instruction):
+    return sample_query_request([], sample_instruction)
 
 
 # Tests
 def test_init_default_prompt(default_manager):
-    assert default_manager.system_prompt == "You are CodeChat, a helpful assistant for working with code."
-    assert default_manager.get_system_prompt() == "You are CodeChat, a helpful assistant for working with code."
+    assert default_manager.system_prompt == DEFAULT_SYSTEM_PROMPT
+    assert default_manager.get_system_prompt() == DEFAULT_SYSTEM_PROMPT
 
 def test_init_custom_prompt(custom_manager):
-    assert custom_manager.system_prompt == "Test System Prompt"
-    assert custom_manager.get_system_prompt() == "Test System Prompt"
-
-def test_format_openai(default_manager, sample_history, sample_instruction):
-    expected = [
-        {"role": "developer", "content": default_manager.system_prompt},
-        {"role": "user", "content": "Previous question"},
-        {"role": "assistant", "content": "Previous answer"},
-        {"role": "assistant", "content": "file\nFile content 1"},
-        {"role": "assistant", "content": "method\nMethod content 2"},
-        {"role": "user", "content": "Current question"},
-    ]
-    assert default_manager._format_openai(sample_query_request(sample_history, sample_instruction)) == expected
-
-def test_format_openai_no_history(default_manager, sample_instruction):
-    expected = [
-        {"role": "developer", "content": default_manager.system_prompt},
-        {"role": "assistant", "content": "file\nFile content 1"},
-        {"role": "assistant", "content": "method\nMethod content 2"},
-        {"role": "user", "content": "Current question"},
-    ]
-    assert default_manager._format_openai(sample_query_request([], sample_instruction)) == expected
-
-def test_format_anthropic(default_manager, sample_history, sample_instruction):
-    # Anthropic format usually doesn't include the system prompt directly in messages
-    expected = [
-        {"role": "user", "content": "Previous question"},
-        {"role": "assistant", "content": "Previous answer"},        
-        {"role": "user", "content": "file\nFile content 1"},
-        {"role": "user", "content": "method\nMethod content 2"},
-        {"role": "user", "content": "Current question"},
-    ]
-    # Note: The system prompt might be passed separately to the Anthropic client
-    assert default_manager._format_anthropic(sample_query_request(sample_history, sample_instruction)) == expected
+    assert custom_manager.system_prompt == CUSTOM_SYSTEM_PROMPT
+    assert custom_manager.get_system_prompt() == CUSTOM_SYSTEM_PROMPT
 
-def test_format_anthropic_no_history(default_manager, sample_instruction):
-    expected = [        
-        {"role": "user", "content": "file\nFile content 1"},
-        {"role": "user", "content": "method\nMethod content 2"},
-        {"role": "user", "content": "Current question"},
-    ]
-    assert default_manager._format_anthropic(sample_query_request([], sample_instruction)) == expected
-
-def test_format_google(default_manager, sample_history, sample_instruction):
+@pytest.mark.parametrize("formatter,expected", [
+    ("_format_openai", OPENAI_EXPECTED),
+    # Azure should behave like OpenAI
+    ("_format_azure", OPENAI_EXPECTED),
+    # Note: The system prompt might be passed separately to the Anthropic client
+    ("_format_anthropic", ANTHROPIC_EXPECTED),
+], ids=["openai", "azure", "anthropic"])
+def test_format_messages(default_manager, sample_request, formatter, expected):
+    assert getattr(default_manager, formatter)(sample_request) == expected
+
+@pytest.mark.parametrize("formatter,expected", [
+    ("_format_openai", OPENAI_EXPECTED_NO_HISTORY),
+    ("_format_azure", OPENAI_EXPECTED_NO_HISTORY),
+    ("_format_anthropic", ANTHROPIC_EXPECTED_NO_HISTORY),
+], ids=["openai", "azure", "anthropic"])
+def test_format_messages_no_history(default_manager, sample_request_no_history, formatter, expected):
+    assert getattr(default_manager, formatter)(sample_request_no_history) == expected
+
+def test_format_google(default_manager, sample_request):
     # Google format uses specific types and maps 'assistant' to 'model'
     # It typically doesn't include the system prompt within the main message list
-    result = default_manager._format_google(sample_query_request(sample_history, sample_instruction))
+    result = default_manager._format_google(sample_request)
     assert isinstance(result, list)
     assert len(result) == 2 # history (no instruction) but two contexts
     assert all(isinstance(item, genai_types.Content) for item in result)
@@ -101,32 +111,13 @@ def test_format_google(default_manager, sample_history, sample_instruction):
     assert result[1].role == "model" # Note the role change
     assert result[1].parts[0].text == "Previous answer"
 
-def test_format_google_no_history(default_manager, sample_instruction):
-    result = default_manager._format_google(sample_query_request([], sample_instruction))
+def test_format_google_no_history(default_manager, sample_request_no_history):
+    result = default_manager._format_google(sample_request_no_history)
     assert isinstance(result, list)
     assert len(result) == 0
 
-def test_format_azure(default_manager, sample_history, sample_instruction):
-    # Azure should behave like OpenAI
-    expected = [
-        {"role": "developer", "content": default_manager.system_prompt},
-        {"role": "user", "content": "Previous question"},
-        {"role": "assistant", "content": "Previous answer"},        
-        {"role": "assistant", "content": "file\nFile content 1"},
-        {"role": "assistant", "content": "method\nMethod content 2"},
-        {"role": "user", "content": "Current question"},
-    ]
-    assert default_manager._format_azure(sample_query_request(sample_history, sample_instruction)) == expected
-
-def test_format_azure_custom_prompt(custom_manager, sample_history, sample_instruction):
-    expected = [
-        {"role": "developer", "content": custom_manager.system_prompt},
-        {"role": "user", "content": "Previous question"},
-        {"role": "assistant", "content": "Previous answer"},
-        {"role": "assistant", "content": "file\nFile content 1"},
-        {"role": "assistant", "content": "method\nMethod content 2"},
-        {"role": "user", "content": "Current question"},
-    ]
-    assert custom_manager._format_azure(sample_query_request(sample_history, sample_instruction)) == expected
+def test_format_azure_custom_prompt(custom_manager, sample_request):
+    expected = [{"role": "developer", "content": CUSTOM_SYSTEM_PROMPT}] + OPENAI_EXPECTED[1:]
+    assert custom_manager._format_azure(sample_request) == expected
 
 # --- End of test file ---